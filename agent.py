@@ -1,19 +1,92 @@
+import csv
+import functools
+import httpx
+import io
 import os
+import sqlglot
+import time
 from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.caches import InMemoryCache
+from langchain_core.messages import (
+    AIMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
 from langchain_core.tools import tool
-from langchain.agents import create_tool_calling_agent, AgentExecutor
+from langgraph.graph import END, START, MessagesState, StateGraph
+from langgraph.prebuilt import create_react_agent
 from pydantic import SecretStr
 from sqlalchemy import text, inspect
+from sqlalchemy.engine.reflection import ObjectKind
 from sqlalchemy.exc import SQLAlchemyError
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+from sqlglot.tokens import TokenType
 
 model = "anthropic/claude-sonnet-4"
+# Smaller, faster model for the tool-calling rounds; `model` writes the answer
+router_model = "anthropic/claude-3.5-haiku"
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+# Tag on the answer-writing model, so callers can stream only the final answer
+ANSWER_TAG = "final_answer"
+
+# Rows returned to the model per query; larger results are truncated
+MAX_RESULT_ROWS = int(os.getenv("MAX_RESULT_ROWS", "200"))
+
+# Seconds before cached table names and schemas are fetched again
+SCHEMA_TTL = int(os.getenv("SCHEMA_TTL", "300"))
+
+# Results up to this many rows use the verbose per-row layout instead of TSV
+VERBOSE_RESULT_ROWS = 3
+
+# Databases with up to this many tables get their whole schema inlined in the
+# system prompt; larger ones are discovered through the schema tools
+MAX_PROMPT_SCHEMA_TABLES = 50
+
+# Most recent tool results that are always sent back to the model verbatim
+KEEP_RECENT_STEPS = 3
+
+# Tool-calling rounds the router may take per question before it must hand
+# what it has found to the answer model
+MAX_AGENT_STEPS = int(os.getenv("MAX_AGENT_STEPS", "6"))
+
+# Graph step budget per question. limit_tool_rounds is what ends the loop;
+# each round takes four steps (both hooks, model, tools), and the extra
+# headroom covers the final model call and the answer node
+RECURSION_LIMIT = 4 * MAX_AGENT_STEPS + 10
+
+# SQLAlchemy dialect name -> sqlglot dialect used to parse generated queries
+SQLGLOT_DIALECTS = {
+    "postgresql": "postgres",
+    "mysql": "mysql",
+    "mariadb": "mysql",
+    "sqlite": "sqlite",
+}
+
+# Driver error codes for queries that reference a missing column or table
+MISSING_OBJECT_ERRORS = {
+    "42703": "column",  # PostgreSQL undefined_column
+    "42P01": "table",  # PostgreSQL undefined_table
+    1054: "column",  # MySQL ER_BAD_FIELD_ERROR
+    1146: "table",  # MySQL ER_NO_SUCH_TABLE
+}
+
+# Nodes that make a parsed query write, lock or create something; none of them
+# may appear anywhere in the tree, including inside CTEs and subqueries
+WRITE_EXPRESSIONS = (
+    exp.Insert,
+    exp.Update,
+    exp.Delete,
+    exp.Merge,
+    exp.Into,
+    exp.Lock,
+)
 
-prompt = ChatPromptTemplate.from_messages(
-    [
-        (
-            "system",
-            """You are a helpful SQL database assistant. You help users answer questions about their database by querying their database.
+SYSTEM_PROMPT = """You are a helpful SQL database assistant. You help users answer questions about their database by querying their database.
 
 CRITICAL RULES:
 1. You can ONLY execute SELECT queries. No INSERT, UPDATE, DELETE, or data modification allowed even if the user asks. This is a very STRICT rule.
@@ -23,7 +96,7 @@ CRITICAL RULES:
 
 WORKFLOW:
 1. First, get table names to understand the database structure
-2. Then, get the schema for relevant tables to see exact column names and types
+2. Then, get the schema for relevant tables to see exact column names and types. When several tables are relevant, fetch them all with one get_tables_schema call
 3. Finally, write your SQL query using the EXACT column names from the schema
 
 SQL BEST PRACTICES:
@@ -35,73 +108,363 @@ SQL BEST PRACTICES:
 You have access to these tools:
 - get_table_names: Get all table names in the database
 - get_table_schema: Get detailed column information for a specific table (shows exact column names)
+- get_tables_schema: Get detailed column information for several tables in one call
 - execute_sql_query: Execute a SELECT query (only SELECT queries allowed)
 
 Always use the schema information to write accurate SQL queries with correct column names.
-""",
-        ),
-        ("human", "{input}"),
-        MessagesPlaceholder(variable_name="agent_scratchpad"),
+"""
+
+SCHEMA_PROMPT = """
+SCHEMA (every table and view in the database, as table(column:type, ...)):
+{schema_summary}
+
+This schema is complete and current, so you can usually write queries without calling get_table_names or get_table_schema. Use those tools only if a query reports a missing table or column.
+"""
+
+
+def make_prompt(schema_summary=None):
+    """Build the system message, optionally with the database schema inlined."""
+    prompt_text = SYSTEM_PROMPT
+    if schema_summary:
+        prompt_text += SCHEMA_PROMPT.format(schema_summary=schema_summary)
+
+    # The system prompt (and the tool definitions sent ahead of it) is
+    # identical on every LLM round, so mark it as a cacheable prefix.
+    # OpenRouter forwards cache_control to providers that support it.
+    return SystemMessage(
+        content=[
+            {
+                "type": "text",
+                "text": prompt_text,
+                "cache_control": {"type": "ephemeral"},
+            }
+        ]
+    )
+
+
+def parse_select_query(sql_query, dialect):
+    """Parse a query and check that it is a single read-only SELECT.
+
+    Returns (tree, None) if the query may run, or (None, error message) if not.
+    """
+    try:
+        statements = [
+            statement
+            for statement in sqlglot.parse(sql_query, read=dialect)
+            if statement is not None
+        ]
+    except SqlglotError as e:
+        # TokenError (e.g. an unterminated literal) is not a ParseError and
+        # carries no structured errors; ParseError's message embeds terminal
+        # underline codes, so it is rebuilt from the first error instead
+        errors = getattr(e, "errors", None)
+        if errors:
+            error = errors[0]
+            detail = (
+                f"{error['description']} at line {error['line']}, column {error['col']}"
+            )
+        else:
+            detail = str(e)
+        return (
+            None,
+            f"ERROR: Could not parse the query ({detail}). Only SELECT queries are allowed.",
+        )
+
+    if len(statements) > 1:
+        return (
+            None,
+            "ERROR: Multiple statements are not allowed. Execute one SELECT query at a time.",
+        )
+
+    if not statements or not isinstance(statements[0], exp.Query):
+        return (
+            None,
+            "ERROR: Only SELECT queries are allowed. No INSERT, UPDATE, DELETE, or other modification queries.",
+        )
+
+    tree = statements[0]
+    forbidden = tree.find(*WRITE_EXPRESSIONS)
+    if forbidden is not None:
+        operation = forbidden.key.upper()
+        return (
+            None,
+            f"ERROR: Forbidden operation '{operation}' detected in query. Only SELECT queries are allowed.",
+        )
+
+    return tree, None
+
+
+def append_limit(sql_query, dialect, limit):
+    """Add a LIMIT clause to the query text exactly as written.
+
+    Rendering the parsed tree instead would translate the query (functions,
+    literals, intervals) into sqlglot's idea of the dialect. The text is cut
+    after its last token, so trailing semicolons and comments can't swallow
+    the clause.
+    """
+    tokens = sqlglot.tokenize(sql_query, read=dialect)
+    last = next(t for t in reversed(tokens) if t.token_type != TokenType.SEMICOLON)
+    return f"{sql_query[: last.end + 1]} LIMIT {limit}"
+
+
+def classify_missing_object(error):
+    """Return "column" or "table" if a failed query referenced a missing object."""
+    orig = getattr(error, "orig", None)
+
+    # SQLAlchemy's asyncpg adapter exposes the SQLSTATE as pgcode; aiomysql
+    # raises pymysql errors, which put the error number first in args
+    code = getattr(orig, "pgcode", None)
+    if code is None and orig is not None and orig.args:
+        code = orig.args[0]
+    if isinstance(code, (str, int)) and code in MISSING_OBJECT_ERRORS:
+        return MISSING_OBJECT_ERRORS[code]
+
+    # SQLite only reports these as text
+    lower_msg = str(orig if orig is not None else error).lower()
+    if "no such column" in lower_msg:
+        return "column"
+    if "no such table" in lower_msg:
+        return "table"
+    return None
+
+
+def compact_tool_messages(state):
+    """Replace older query results in the model input with a short placeholder.
+
+    Every tool result is re-sent to the model on each round, so large result
+    sets the model has already read are elided once they fall outside the last
+    KEEP_RECENT_STEPS tool results. Schema lookups stay verbatim because the
+    model needs the exact column names to keep writing queries. Only the model
+    input is compacted; the graph state keeps the full messages.
+    """
+    messages = state["messages"]
+    tool_indexes = [i for i, m in enumerate(messages) if isinstance(m, ToolMessage)]
+    elided = set(tool_indexes[:-KEEP_RECENT_STEPS])
+
+    compacted = [
+        message.model_copy(
+            update={
+                "content": "[Earlier query result elided. Run the query again if you need it.]"
+            }
+        )
+        if i in elided and message.name == "execute_sql_query"
+        else message
+        for i, message in enumerate(messages)
     ]
-)
+
+    return {"llm_input_messages": compacted}
+
+
+def limit_tool_rounds(state):
+    """End the router's loop once it has used MAX_AGENT_STEPS tool-calling rounds.
+
+    The model's reply is replaced by one without tool calls, which the router
+    treats as done. write_answer drops that reply and answers from the results
+    gathered so far.
+    """
+    messages = state["messages"]
+    if not getattr(messages[-1], "tool_calls", None):
+        return {}
+
+    rounds = 0
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            break
+        if isinstance(message, AIMessage) and message.tool_calls:
+            rounds += 1
+
+    if rounds <= MAX_AGENT_STEPS:
+        return {}
+
+    # Same id, so the reply replaces the one with the tool calls
+    stop = AIMessage(
+        content=f"Stopped after {MAX_AGENT_STEPS} rounds of tool calls.",
+        id=messages[-1].id,
+    )
+    return {"messages": [stop]}
+
+
+def format_schema_summary(multi_columns):
+    """Render one compact table(column:type, ...) line per table for the system prompt."""
+    lines = []
+    for (_, table_name), columns in sorted(
+        multi_columns.items(), key=lambda item: item[0][1]
+    ):
+        column_list = ", ".join(f"{col['name']}:{col['type']}" for col in columns)
+        lines.append(f"{table_name}({column_list})")
+
+    return "\n".join(lines)
+
+
+def format_table_names(table_names):
+    """Render the numbered table list returned by get_table_names."""
+    result = f"Found {len(table_names)} tables in the database:\n"
+    for i, table in enumerate(table_names, 1):
+        result += f"{i}. {table}\n"
+
+    return result.strip()
+
+
+def format_table_schema(table_name, columns):
+    """Render inspector column info for a table in the format shown to the model."""
+    result = f"Schema for table '{table_name}':\n"
+    result += "=" * 50 + "\n"
+    result += f"Total columns: {len(columns)}\n\n"
+
+    for i, col in enumerate(columns, 1):
+        col_name = col["name"]
+        col_type = str(col["type"])
+        nullable = "NULL" if col["nullable"] else "NOT NULL"
+        primary_key = " (PRIMARY KEY)" if col.get("primary_key", False) else ""
+
+        result += f"{i:2}. Column: '{col_name}'\n"
+        result += f"    Type: {col_type}\n"
+        result += f"    Constraints: {nullable}{primary_key}\n\n"
+
+    return result
+
+
+# Compiled agents by engine, so rebuilding for the same engine is free
+_agents = {}
+
+
+def invalidate_schema_cache(db_engine):
+    """Forget the table names and schemas cached for an engine, e.g. after a migration.
+
+    They live in the engine's agent (tool caches and the schema inlined in its
+    prompt), so the agent is dropped and the next create_agent reads the schema
+    again.
+    """
+    _agents.pop(db_engine, None)
+
+
+# Completions keyed on the exact model input (messages, model and bound tools),
+# so a repeated question skips the LLM round-trips whose input is unchanged.
+# Tool results are part of that input, so fresh data still misses the cache.
+llm_cache = InMemoryCache(maxsize=256)
+
+
+@functools.lru_cache(maxsize=1)
+def get_http_client():
+    """Shared HTTP/2 client so every LLM round reuses one multiplexed connection."""
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=60,
+        # Keep idle connections open across the pauses while the user types
+        limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=300),
+    )
 
 
-def create_agent(db_engine, db_connection):
-    """Create an agent with database tools."""
+async def warm_http_client():
+    """Open the connection to OpenRouter ahead of the first LLM call.
 
+    Lets the TCP and TLS handshakes overlap with database setup. Failures are
+    ignored; the first real request simply connects as usual.
+    """
+    try:
+        await get_http_client().head(OPENROUTER_BASE_URL)
+    except httpx.HTTPError:
+        pass
+
+
+async def close_http_client():
+    """Close the shared HTTP client. Call from the loop that used it."""
+    await get_http_client().aclose()
+
+
+@functools.lru_cache(maxsize=None)
+def get_llm(model_name):
+    """Create each chat model once so its HTTP client and connection pool are reused.
+
+    Built lazily rather than at import time because main.py may prompt for the
+    API key after importing this module.
+    """
     OPENROUTER_API_KEY = SecretStr(os.getenv("OPENROUTER_API_KEY"))
-    llm = ChatOpenAI(
-        model=model,
+    return ChatOpenAI(
+        model=model_name,
         temperature=0.0,
         streaming=True,
         api_key=OPENROUTER_API_KEY,
-        base_url="https://openrouter.ai/api/v1",
+        base_url=OPENROUTER_BASE_URL,
+        http_async_client=get_http_client(),
+        cache=llm_cache,
     )
 
+
+async def create_agent(db_engine):
+    """Create an agent with database tools. Cached per engine."""
+    if db_engine in _agents:
+        return _agents[db_engine]
+
+    llm_router = get_llm(router_model)
+    llm_writer = get_llm(model)
+
+    sql_dialect = SQLGLOT_DIALECTS.get(db_engine.dialect.name)
+
+    # Schemas rarely change during a chat session, so introspection results are
+    # reused for SCHEMA_TTL seconds, or until a query reports a missing table
+    # or column.
+    tables_cache = None
+    schema_cache = {}
+    cache_loaded_at = time.monotonic()
+
+    def clear_schema_cache():
+        nonlocal tables_cache, cache_loaded_at
+        tables_cache = None
+        schema_cache.clear()
+        cache_loaded_at = time.monotonic()
+
+    async def inspect_database(method, *args, **kwargs):
+        """Run an Inspector method on a pooled async connection."""
+        async with db_engine.connect() as conn:
+            return await conn.run_sync(
+                lambda sync_conn: getattr(inspect(sync_conn), method)(*args, **kwargs)
+            )
+
+    def expire_stale_schema_cache():
+        if time.monotonic() - cache_loaded_at >= SCHEMA_TTL:
+            clear_schema_cache()
+
     @tool
-    def get_table_names() -> str:
-        """Get the names of all tables in the database to understand the database structure."""
+    async def get_table_names() -> str:
+        """Get the names of all tables and views in the database to understand the database structure."""
+        nonlocal tables_cache
+
+        expire_stale_schema_cache()
+        if tables_cache is not None:
+            return tables_cache
+
         try:
-            inspector = inspect(db_engine)
-            table_names = inspector.get_table_names()
+            table_names = sorted(
+                await inspect_database("get_table_names")
+                + await inspect_database("get_view_names")
+            )
 
             if not table_names:
                 return "No tables found in the database."
 
-            result = f"Found {len(table_names)} tables in the database:\n"
-            for i, table in enumerate(table_names, 1):
-                result += f"{i}. {table}\n"
-
-            return result.strip()
+            tables_cache = format_table_names(table_names)
+            return tables_cache
         except SQLAlchemyError as e:
             return f"Database error while getting table names: {str(e)}"
         except Exception as e:
             return f"Unexpected error while getting table names: {str(e)}"
 
     @tool
-    def get_table_schema(table_name: str) -> str:
+    async def get_table_schema(table_name: str) -> str:
         """Get the schema/column information for a specific table to understand its structure."""
+        expire_stale_schema_cache()
+        if table_name in schema_cache:
+            return schema_cache[table_name]
+
         try:
-            inspector = inspect(db_engine)
-            columns = inspector.get_columns(table_name)
+            columns = await inspect_database("get_columns", table_name)
 
             if not columns:
                 return f"No columns found for table '{table_name}' or table does not exist."
 
-            result = f"Schema for table '{table_name}':\n"
-            result += "=" * 50 + "\n"
-            result += f"Total columns: {len(columns)}\n\n"
-
-            for i, col in enumerate(columns, 1):
-                col_name = col["name"]
-                col_type = str(col["type"])
-                nullable = "NULL" if col["nullable"] else "NOT NULL"
-                primary_key = " (PRIMARY KEY)" if col.get("primary_key", False) else ""
-
-                result += f"{i:2}. Column: '{col_name}'\n"
-                result += f"    Type: {col_type}\n"
-                result += f"    Constraints: {nullable}{primary_key}\n\n"
-
+            result = format_table_schema(table_name, columns)
+            schema_cache[table_name] = result
             return result
         except SQLAlchemyError as e:
             return f"Database error while getting schema for table '{table_name}': {str(e)}"
@@ -109,87 +472,180 @@ def create_agent(db_engine, db_connection):
             return f"Unexpected error while getting schema for table '{table_name}': {str(e)}"
 
     @tool
-    def execute_sql_query(sql_query: str) -> str:
-        """Execute a SQL query and return the results. ONLY SELECT queries are allowed."""
-        query_upper = sql_query.strip().upper()
-
-        FORBIDDEN_OPERATIONS = [
-            "INSERT",
-            "UPDATE",
-            "DELETE",
-            "DROP",
-            "CREATE",
-            "ALTER",
-            "TRUNCATE",
-            "REPLACE",
-            "MERGE",
-            "CALL",
-            "EXEC",
-            "EXECUTE",
-            "GRANT",
-            "REVOKE",
-            "COMMIT",
-            "ROLLBACK",
-            "SAVEPOINT",
-        ]
+    async def get_tables_schema(table_names: list[str]) -> str:
+        """Get the schema/column information for several tables at once. Prefer this over repeated get_table_schema calls."""
+        expire_stale_schema_cache()
+        missing = [name for name in table_names if name not in schema_cache]
 
-        # Check if query starts with SELECT
-        if not query_upper.startswith("SELECT"):
-            return "ERROR: Only SELECT queries are allowed. No INSERT, UPDATE, DELETE, or other modification queries."
+        try:
+            if missing:
+                # One catalog round-trip for every table not cached yet
+                # Views too, like get_table_schema's get_columns
+                multi_columns = await inspect_database(
+                    "get_multi_columns", kind=ObjectKind.ANY, filter_names=missing
+                )
+                for (_, table_name), columns in multi_columns.items():
+                    if columns:
+                        schema_cache[table_name] = format_table_schema(
+                            table_name, columns
+                        )
+        except SQLAlchemyError as e:
+            return f"Database error while getting schema for tables {table_names}: {str(e)}"
+        except Exception as e:
+            return f"Unexpected error while getting schema for tables {table_names}: {str(e)}"
+
+        results = []
+        for table_name in table_names:
+            if table_name in schema_cache:
+                results.append(schema_cache[table_name])
+            else:
+                results.append(
+                    f"No columns found for table '{table_name}' or table does not exist.\n"
+                )
 
-        # Check for forbidden operations anywhere in the query
-        for operation in FORBIDDEN_OPERATIONS:
-            if operation in query_upper:
-                return f"ERROR: Forbidden operation '{operation}' detected in query. Only SELECT queries are allowed."
+        return "\n".join(results)
 
+    @tool
+    async def execute_sql_query(sql_query: str) -> str:
+        """Execute a SQL query and return the results. ONLY SELECT queries are allowed."""
         try:
-            result = db_connection.execute(text(sql_query))
-            rows = result.fetchall()
-            columns = list(result.keys())
+            # A parsed AST, unlike keyword sniffing, isn't fooled by keywords
+            # inside string literals or identifiers
+            tree, error = parse_select_query(sql_query, sql_dialect)
+            if error:
+                return error
+
+            query_to_run = sql_query
+            if not tree.args.get("limit"):
+                # Let the database stop early instead of producing every row
+                query_to_run = append_limit(sql_query, sql_dialect, MAX_RESULT_ROWS + 1)
+
+            # Each call checks out its own pooled connection, so concurrent tool
+            # calls from one turn run side by side on the event loop.
+            # Streaming keeps oversized results on the server instead of
+            # buffering them in the driver.
+            async with db_engine.connect() as conn:
+                result = await conn.stream(
+                    text(query_to_run),
+                    execution_options={"yield_per": MAX_RESULT_ROWS + 1},
+                )
+                # One extra row tells us whether the result was cut off
+                rows = await result.fetchmany(MAX_RESULT_ROWS + 1)
+                columns = list(result.keys())
 
             if not rows:
                 return f"Query executed successfully but returned no results.\nQuery: {sql_query}"
 
-            output = f"Query Results ({len(rows)} row(s)):\n"
-            output += "=" * 50 + "\n"
-            output += f"SQL: {sql_query}\n\n"
-
-            output += "Columns: " + " | ".join(columns) + "\n"
-            output += "-" * 50 + "\n"
-
-            for i, row in enumerate(rows, 1):
-                output += f"Row {i}:\n"
-                for col, value in zip(columns, row):
-                    output += f"  {col}: {value}\n"
-                output += "\n"
-
-            output += (
+            truncated = len(rows) > MAX_RESULT_ROWS
+            rows = rows[:MAX_RESULT_ROWS]
+
+            parts = [
+                f"Query Results ({len(rows)} row(s)):",
+                "=" * 50,
+                f"SQL: {sql_query}\n",
+            ]
+
+            if len(rows) <= VERBOSE_RESULT_ROWS:
+                parts.append("Columns: " + " | ".join(columns))
+                parts.append("-" * 50)
+                parts.extend(
+                    f"Row {i}:\n"
+                    + "\n".join(f"  {col}: {value}" for col, value in zip(columns, row))
+                    + "\n"
+                    for i, row in enumerate(rows, 1)
+                )
+            else:
+                # Tab-separated rows cost a fraction of the tokens of the
+                # per-row "column: value" layout
+                buffer = io.StringIO()
+                writer = csv.writer(buffer, delimiter="\t", lineterminator="\n")
+                writer.writerow(columns)
+                writer.writerows(rows)
+                parts.append("Rows (tab-separated, first line is the header):")
+                parts.append(buffer.getvalue())
+
+            if truncated:
+                parts.append(
+                    f"... (truncated, only the first {MAX_RESULT_ROWS} rows are shown. "
+                    "Filter or aggregate the query if you need the rest.)"
+                )
+            parts.append(
                 f"Summary: {len(rows)} row(s) returned with {len(columns)} column(s)"
             )
 
-            return output
+            return "\n".join(parts)
 
         except SQLAlchemyError as e:
             error_msg = str(e)
-            if "column" in error_msg.lower() and "does not exist" in error_msg.lower():
+            missing = classify_missing_object(e)
+
+            if missing == "column":
+                clear_schema_cache()
                 return f"SQL ERROR - Column does not exist: {error_msg}\n\nHINT: Check column names for exact case sensitivity. Use double quotes around column names if needed.\nQuery attempted: {sql_query}"
-            elif "table" in error_msg.lower() and "does not exist" in error_msg.lower():
+            elif missing == "table":
+                clear_schema_cache()
                 return f"SQL ERROR - Table does not exist: {error_msg}\n\nHINT: Use get_table_names to see available tables.\nQuery attempted: {sql_query}"
             else:
                 return f"SQL ERROR: {error_msg}\nQuery attempted: {sql_query}"
         except Exception as e:
             return f"Unexpected error executing query: {str(e)}\nQuery attempted: {sql_query}"
 
-    tools = [get_table_names, get_table_schema, execute_sql_query]
-
-    agent = create_tool_calling_agent(llm, tools, prompt)
+    tools = [get_table_names, get_table_schema, get_tables_schema, execute_sql_query]
+
+    # Warm both caches with a single catalog round-trip, so the first question
+    # doesn't pay one introspection query per table. Small schemas are also
+    # inlined in the prompt, which is cheaper than discovering them over one or
+    # two extra LLM + DB rounds per question.
+    schema_summary = None
+    try:
+        multi_columns = await inspect_database("get_multi_columns", kind=ObjectKind.ANY)
+        table_names = sorted(table_name for _, table_name in multi_columns)
+        if table_names:
+            tables_cache = format_table_names(table_names)
+        for (_, table_name), columns in multi_columns.items():
+            schema_cache[table_name] = format_table_schema(table_name, columns)
+        cache_loaded_at = time.monotonic()
+
+        if len(table_names) <= MAX_PROMPT_SCHEMA_TABLES:
+            schema_summary = format_schema_summary(multi_columns)
+    except SQLAlchemyError:
+        # Fall back to tool-based discovery
+        clear_schema_cache()
+
+    prompt = make_prompt(schema_summary)
+
+    # The router model drives the tool loop; ToolNode runs all tool calls from
+    # one model turn concurrently
+    router = create_react_agent(
+        llm_router,
+        tools,
+        prompt=prompt,
+        pre_model_hook=compact_tool_messages,
+        post_model_hook=limit_tool_rounds,
+    )
 
-    agent_executor = AgentExecutor(
-        agent=agent,
-        tools=tools,
-        verbose=False,
-        stream_runnable=True,
-        return_intermediate_steps=True,
+    # Tools stay bound (but unusable) because providers reject histories with
+    # tool calls when no tools are defined
+    writer = llm_writer.bind_tools(tools, tool_choice="none").with_config(
+        tags=[ANSWER_TAG]
     )
 
-    return agent_executor
+    async def write_answer(state):
+        """Write the final answer with the larger model, replacing the router's reply.
+
+        The writer sees every tool result verbatim: unlike the router, it can't
+        re-run an elided query.
+        """
+        *messages, router_reply = state["messages"]
+        response = await writer.ainvoke([prompt, *messages])
+        return {"messages": [RemoveMessage(id=router_reply.id), response]}
+
+    graph = StateGraph(MessagesState)
+    graph.add_node("router", router)
+    graph.add_node("answer", write_answer)
+    graph.add_edge(START, "router")
+    graph.add_edge("router", "answer")
+    graph.add_edge("answer", END)
+
+    _agents[db_engine] = graph.compile().with_config(recursion_limit=RECURSION_LIMIT)
+    return _agents[db_engine]
@@ -1,19 +1,93 @@
 import os
+import inspect
+import asyncpg
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.exc import SQLAlchemyError
-from agent import create_agent
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.exc import ArgumentError, SQLAlchemyError
+from agent import (
+    ANSWER_TAG,
+    create_agent,
+    close_http_client,
+    invalidate_schema_cache,
+    warm_http_client,
+)
 from getpass import getpass
 import asyncio
+import contextlib
+import threading
 
 load_dotenv()  # In case of using .env file
 
+# No LangSmith tracing unless explicitly enabled, and never block agent steps
+# on callback handlers
+os.environ.setdefault("LANGCHAIN_TRACING_V2", "false")
+os.environ.setdefault("LANGCHAIN_CALLBACKS_BACKGROUND", "true")
+
+ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+# URL query parameters asyncpg takes as connect() arguments; SQLAlchemy's
+# adapter also reads prepared_statement_cache_size
+ASYNCPG_URL_PARAMS = set(inspect.signature(asyncpg.connect).parameters) | {
+    "prepared_statement_cache_size"
+}
+
 db_engine = None
-db_connection = None
 
 
-def main():
-    global db_engine, db_connection
+def to_asyncpg_url(url):
+    """Adapt libpq-style query parameters in a Postgres URL for asyncpg.
+
+    sslmode becomes asyncpg's ssl argument, which takes the same mode names.
+    Any other parameter asyncpg doesn't know is rejected up front, instead of
+    failing inside connect() with a TypeError.
+    """
+    query = dict(url.query)
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+
+    unsupported = sorted(set(query) - ASYNCPG_URL_PARAMS)
+    if unsupported:
+        raise ArgumentError(
+            "Unsupported Postgres URL parameter(s) for the asyncpg driver: "
+            f"{', '.join(unsupported)}. Remove them from DATABASE_URL."
+        )
+
+    return url.set(query=query)
+
+
+async def read_input(prompt):
+    """Read a line from stdin without blocking the event loop.
+
+    Uses a daemon thread rather than asyncio.to_thread so that a pending read
+    never keeps the interpreter alive after Ctrl+C.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(setter, value):
+        if not future.done():
+            setter(value)
+
+    def read():
+        try:
+            line = input(prompt)
+        except BaseException as e:
+            loop.call_soon_threadsafe(resolve, future.set_exception, e)
+        else:
+            loop.call_soon_threadsafe(resolve, future.set_result, line)
+
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
+
+async def amain():
+    global db_engine
 
     if not os.environ.get("OPENROUTER_API_KEY"):
         os.environ["OPENROUTER_API_KEY"] = getpass(
@@ -23,50 +97,80 @@ def main():
     if not os.environ.get("DATABASE_URL"):
         os.environ["DATABASE_URL"] = getpass("Please enter your database URL: ")
 
-    database_url = os.environ.get("DATABASE_URL")
-
-    if "mysql" in database_url:
-        database_url = database_url.replace("mysql", "mysql+pymysql")
+    # Connect to OpenRouter in the background while the database is set up
+    warm_up = asyncio.create_task(warm_http_client())
 
     print("Initializing database connection...")
 
     try:
-        db_engine = create_engine(database_url)
-        db_connection = db_engine.connect()
-        print("✅ Database connection established successfully!")
-
-        agent_executor = create_agent(db_engine, db_connection)
-    except SQLAlchemyError as e:
-        print(f"❌ Failed to connect to database: {e}")
-        return
-    except Exception as e:
-        print(f"❌ Unexpected error during setup: {e}")
-        return
+        try:
+            # Use the async driver for each supported database, whichever driver
+            # the URL names (e.g. postgresql+psycopg2://)
+            database_url = make_url(os.environ.get("DATABASE_URL"))
+            backend = database_url.get_backend_name()
+            if backend in ASYNC_DRIVERS:
+                database_url = database_url.set(drivername=ASYNC_DRIVERS[backend])
+            if backend in ("postgres", "postgresql"):
+                database_url = to_asyncpg_url(database_url)
+
+            engine_options = {"pool_pre_ping": True}
+            if backend != "sqlite":
+                # SQLite uses its own pool classes that don't take sizing options
+                engine_options.update(
+                    pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+                    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+                    pool_recycle=1800,
+                    pool_use_lifo=True,
+                )
+
+            db_engine = create_async_engine(database_url, **engine_options)
+            async with db_engine.connect():
+                pass
+            print("✅ Database connection established successfully!")
+
+            agent = await create_agent(db_engine)
+        except ArgumentError as e:
+            print(f"❌ Invalid database URL: {e}")
+            return
+        except (SQLAlchemyError, OSError) as e:
+            # asyncpg raises refused or unreachable connections as plain OSErrors
+            print(f"❌ Failed to connect to database: {e}")
+            return
+        except Exception as e:
+            print(f"❌ Unexpected error during setup: {e}")
+            return
 
-    print("\nSQL NLP Bot is ready! Ask me anything about your database.")
-    print("Type 'quit' or 'q' to exit.\n")
+        print("\nSQL NLP Bot is ready! Ask me anything about your database.")
+        print("Type 'refresh' after changing the database schema.")
+        print("Type 'quit' or 'q' to exit.\n")
 
-    while True:
-        print("\nUser: ", end="")
-        user_query = input().strip()
-        print("\n")
+        while True:
+            user_query = (await read_input("\nUser: ")).strip()
+            print("\n")
 
-        if user_query.lower() in ["quit", "q"]:
-            print("Goodbye!")
-            break
+            if user_query.lower() in ["quit", "q"]:
+                print("Goodbye!")
+                break
 
-        if not user_query:
-            continue
+            if not user_query:
+                continue
 
-        print("🤖 The bot is thinking...\n")
+            if user_query.lower() == "refresh":
+                invalidate_schema_cache(db_engine)
+                agent = await create_agent(db_engine)
+                print("🔄 Schema reloaded.")
+                continue
 
-        try:
+            print("🤖 The bot is thinking...\n")
 
-            async def stream_response():
+            try:
                 tool_count = 0
+                answer_streamed = False
 
-                async for event in agent_executor.astream_events(
-                    {"input": user_query}, version="v2"
+                async for event in agent.astream_events(
+                    {"messages": [("user", user_query)]},
+                    version="v2",
+                    config={"callbacks": [], "run_name": "sql_agent"},
                 ):
                     event_type = event.get("event")
 
@@ -80,30 +184,56 @@ def main():
 
                     elif event_type == "on_tool_end":
                         tool_output = event.get("data", {}).get("output", "")
+                        # ToolNode wraps results in a ToolMessage
+                        tool_output = getattr(tool_output, "content", tool_output)
                         print("\r   Status: ✅ Complete")
                         print(f"   Result: {tool_output}")
                         print("   " + "─" * 50)
                         print("\n")
 
-                    elif event_type == "on_chat_model_stream":
+                    elif (
+                        event_type == "on_chat_model_stream"
+                        and ANSWER_TAG in event.get("tags", [])
+                    ):
                         chunk = event.get("data", {}).get("chunk", {})
                         if hasattr(chunk, "content") and chunk.content:
+                            answer_streamed = True
                             print(chunk.content, end="", flush=True)
 
-            asyncio.run(stream_response())
+                    elif (
+                        event_type == "on_chat_model_end"
+                        and ANSWER_TAG in event.get("tags", [])
+                        and not answer_streamed
+                    ):
+                        # Answers served from the LLM cache arrive whole,
+                        # without any stream events
+                        output = event.get("data", {}).get("output")
+                        print(getattr(output, "content", ""), end="", flush=True)
+
+            except SQLAlchemyError as e:
+                print(f"❌ Database Error: {e}")
+                print("=" * 60)
+            except Exception as e:
+                print(f"❌ Unexpected Error: {e}")
+                print("=" * 60)
+    finally:
+        # Don't wait out the request timeout if OpenRouter isn't reachable
+        warm_up.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await warm_up
+        await close_http_client()
+
+        if db_engine:
+            await db_engine.dispose()
 
-        except SQLAlchemyError as e:
-            print(f"❌ Database Error: {e}")
-            print("=" * 60)
-        except KeyboardInterrupt:
-            print("\n\n❌ Interrupted by user")
-            break
-        except Exception as e:
-            print(f"❌ Unexpected Error: {e}")
-            print("=" * 60)
 
-    if db_connection:
-        db_connection.close()
+def main():
+    # One event loop for the whole session, so the shared HTTP client's pooled
+    # connections stay usable from one turn to the next
+    try:
+        asyncio.run(amain())
+    except KeyboardInterrupt:
+        print("\n\n❌ Interrupted by user")
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 import psycopg2
+from psycopg2.extras import execute_values
 import random
 from datetime import datetime, timedelta
 
@@ -21,10 +22,7 @@ def populate_data():
         ("eve_davis", "eve@example.com"),
     ]
 
-    for username, email in users:
-        cur.execute(
-            "INSERT INTO users (username, email) VALUES (%s, %s)", (username, email)
-        )
+    execute_values(cur, "INSERT INTO users (username, email) VALUES %s", users)
 
     categories = [
         ("Electronics", "Electronic devices and gadgets"),
@@ -33,10 +31,9 @@ def populate_data():
         ("Home & Garden", "Home improvement and gardening"),
     ]
 
-    for name, desc in categories:
-        cur.execute(
-            "INSERT INTO categories (name, description) VALUES (%s, %s)", (name, desc)
-        )
+    execute_values(
+        cur, "INSERT INTO categories (name, description) VALUES %s", categories
+    )
 
     products = [
         ("Laptop", "High-performance laptop", 899.99, 1),
@@ -49,42 +46,65 @@ def populate_data():
         ("Plant Pot", "Ceramic plant pot", 12.99, 4),
     ]
 
-    for name, desc, price, cat_id in products:
-        cur.execute(
-            "INSERT INTO products (name, description, price, category_id) VALUES (%s, %s, %s, %s)",
-            (name, desc, price, cat_id),
-        )
+    execute_values(
+        cur,
+        "INSERT INTO products (name, description, price, category_id) VALUES %s",
+        products,
+    )
+
+    cur.execute("SELECT id, price FROM products")
+    prices = dict(cur.fetchall())
+
+    # Build every order and its items up front, so each table is written with
+    # a single batched statement
+    orders = []
+    items_per_order = []
 
     for i in range(10):
         user_id = random.randint(1, 5)
         order_date = datetime.now() - timedelta(days=random.randint(0, 30))
-        cur.execute(
-            "INSERT INTO orders (user_id, order_date) VALUES (%s, %s) RETURNING id",
-            (user_id, order_date),
-        )
-        order_id = cur.fetchone()[0]
 
         num_items = random.randint(1, 4)
         total_amount = 0
+        items = []
 
         for _ in range(num_items):
             product_id = random.randint(1, 8)
             quantity = random.randint(1, 3)
+            unit_price = prices[product_id]
 
-            cur.execute("SELECT price FROM products WHERE id = %s", (product_id,))
-            unit_price = cur.fetchone()[0]
+            items.append((product_id, quantity, unit_price))
+            total_amount += unit_price * quantity
 
-            cur.execute(
-                "INSERT INTO order_items (order_id, product_id, quantity, unit_price) VALUES (%s, %s, %s, %s)",
-                (order_id, product_id, quantity, unit_price),
-            )
+        orders.append((user_id, order_date, total_amount))
+        items_per_order.append(items)
 
-            total_amount += unit_price * quantity
+    # Reserve the order ids first, so items are tied to their order without
+    # relying on the row order of INSERT ... RETURNING
+    cur.execute(
+        "SELECT nextval(pg_get_serial_sequence('orders', 'id')) "
+        "FROM generate_series(1, %s)",
+        (len(orders),),
+    )
+    order_ids = [order_id for (order_id,) in cur.fetchall()]
+
+    execute_values(
+        cur,
+        "INSERT INTO orders (id, user_id, order_date, total_amount) VALUES %s",
+        [(order_id, *order) for order_id, order in zip(order_ids, orders)],
+    )
 
-        cur.execute(
-            "UPDATE orders SET total_amount = %s WHERE id = %s",
-            (total_amount, order_id),
-        )
+    order_items = [
+        (order_id, product_id, quantity, unit_price)
+        for order_id, items in zip(order_ids, items_per_order)
+        for product_id, quantity, unit_price in items
+    ]
+
+    execute_values(
+        cur,
+        "INSERT INTO order_items (order_id, product_id, quantity, unit_price) VALUES %s",
+        order_items,
+    )
 
     conn.commit()
     cur.close()
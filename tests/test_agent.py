@@ -0,0 +1,127 @@
+import unittest
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import agent
+
+
+class FakeChatModel(GenericFakeChatModel):
+    """Scripted chat model that records the input of every call."""
+
+    inputs: list = []
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.inputs.append(list(messages))
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+
+def tool_call_round(i, sql_query="SELECT 1"):
+    return AIMessage(
+        "",
+        tool_calls=[
+            {
+                "name": "execute_sql_query",
+                "args": {"sql_query": sql_query},
+                "id": f"call_{i}",
+            }
+        ],
+    )
+
+
+class AgentGraphTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        self.original_get_llm = agent.get_llm
+
+    async def asyncTearDown(self):
+        agent.get_llm = self.original_get_llm
+        agent._agents.clear()
+        await self.engine.dispose()
+
+    async def run_agent(self, router_replies):
+        router = FakeChatModel(messages=iter(router_replies), inputs=[])
+        writer = FakeChatModel(messages=iter([AIMessage("answer")]), inputs=[])
+        agent.get_llm = lambda name: router if name == agent.router_model else writer
+
+        graph = await agent.create_agent(self.engine)
+        result = await graph.ainvoke({"messages": [("user", "question")]})
+        return result, router, writer
+
+    async def test_router_that_never_stops_still_gets_an_answer(self):
+        rounds = [tool_call_round(i) for i in range(agent.MAX_AGENT_STEPS * 3)]
+        result, router, writer = await self.run_agent(rounds)
+
+        self.assertEqual(result["messages"][-1].content, "answer")
+        self.assertEqual(len(router.inputs), agent.MAX_AGENT_STEPS + 1)
+        tool_messages = [m for m in writer.inputs[0] if isinstance(m, ToolMessage)]
+        self.assertEqual(len(tool_messages), agent.MAX_AGENT_STEPS)
+
+    async def test_writer_sees_every_query_result(self):
+        rounds = [tool_call_round(i, f"SELECT {i} AS n") for i in range(5)]
+        _, _, writer = await self.run_agent([*rounds, AIMessage("done")])
+
+        tool_messages = [m for m in writer.inputs[0] if isinstance(m, ToolMessage)]
+        self.assertEqual(len(tool_messages), 5)
+        self.assertTrue(all("elided" not in m.content for m in tool_messages))
+
+    async def test_untokenizable_query_is_reported_to_the_model(self):
+        rounds = [tool_call_round(0, "SELECT 'abc"), AIMessage("done")]
+        result, _, _ = await self.run_agent(rounds)
+
+        tool_message = next(m for m in result["messages"] if isinstance(m, ToolMessage))
+        self.assertIn("Could not parse the query", tool_message.content)
+
+    async def test_tables_schema_includes_views(self):
+        async with self.engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE users (id INTEGER, name TEXT)"))
+            await conn.execute(text("CREATE VIEW v AS SELECT name FROM users"))
+
+        call = {
+            "name": "get_tables_schema",
+            "args": {"table_names": ["users", "v"]},
+            "id": "call_0",
+        }
+        rounds = [AIMessage("", tool_calls=[call]), AIMessage("done")]
+        result, _, _ = await self.run_agent(rounds)
+
+        tool_message = next(m for m in result["messages"] if isinstance(m, ToolMessage))
+        self.assertIn("Schema for table 'users'", tool_message.content)
+        self.assertIn("Schema for table 'v'", tool_message.content)
+
+    async def test_prompt_schema_includes_views(self):
+        async with self.engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE users (id INTEGER, name TEXT)"))
+            await conn.execute(text("CREATE VIEW v AS SELECT name FROM users"))
+
+        _, router, _ = await self.run_agent([AIMessage("done")])
+
+        system_prompt = router.inputs[0][0].content[0]["text"]
+        self.assertIn("users(id:INTEGER, name:TEXT)", system_prompt)
+        self.assertIn("v(name:TEXT)", system_prompt)
+
+    async def test_invalidate_schema_cache_reloads_the_schema(self):
+        _, router, _ = await self.run_agent([AIMessage("done")])
+        async with self.engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE orders (id INTEGER)"))
+
+        agent.invalidate_schema_cache(self.engine)
+        _, router, _ = await self.run_agent([AIMessage("done")])
+
+        system_prompt = router.inputs[0][0].content[0]["text"]
+        self.assertIn("orders(id:INTEGER)", system_prompt)
+
+    async def test_answer_replaces_the_router_reply(self):
+        result, _, _ = await self.run_agent([AIMessage("done")])
+
+        contents = [m.content for m in result["messages"]]
+        self.assertEqual(contents, ["question", "answer"])
+
+
+if __name__ == "__main__":
+    unittest.main()
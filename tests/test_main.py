@@ -0,0 +1,27 @@
+import unittest
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import ArgumentError
+
+from main import to_asyncpg_url
+
+
+class AsyncpgUrlTest(unittest.TestCase):
+    def test_sslmode_becomes_ssl(self):
+        url = make_url("postgresql+asyncpg://user:pw@host/db?sslmode=require")
+        self.assertEqual(dict(to_asyncpg_url(url).query), {"ssl": "require"})
+
+    def test_asyncpg_parameters_pass_through(self):
+        url = make_url("postgresql+asyncpg://user:pw@host/db?target_session_attrs=any")
+        self.assertEqual(to_asyncpg_url(url), url)
+
+    def test_libpq_only_parameters_are_rejected(self):
+        url = make_url(
+            "postgresql+asyncpg://user:pw@host/db?sslmode=require&channel_binding=require"
+        )
+        with self.assertRaisesRegex(ArgumentError, "channel_binding"):
+            to_asyncpg_url(url)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+
+from agent import append_limit, parse_select_query
+
+
+class AppendLimitTest(unittest.TestCase):
+    def test_query_text_is_kept_as_written(self):
+        cases = [
+            (
+                "mysql",
+                "SELECT a FROM t WHERE b RLIKE 'x' AND c > NOW() - INTERVAL 7 DAY",
+                "SELECT a FROM t WHERE b RLIKE 'x' AND c > NOW() - INTERVAL 7 DAY LIMIT 5",
+            ),
+            ("postgres", "SELECT $$abc$$, now()", "SELECT $$abc$$, now() LIMIT 5"),
+            ("postgres", 'SELECT "a b" FROM "T"', 'SELECT "a b" FROM "T" LIMIT 5'),
+            ("sqlite", "SELECT 'it''s'", "SELECT 'it''s' LIMIT 5"),
+        ]
+        for dialect, query, expected in cases:
+            with self.subTest(query=query):
+                self.assertEqual(append_limit(query, dialect, 5), expected)
+
+    def test_trailing_semicolons_and_comments_are_dropped(self):
+        cases = [
+            "SELECT 1;",
+            "SELECT 1 ; ",
+            "SELECT 1 -- note",
+            "SELECT 1; -- note; more",
+            "SELECT 1\n/* note */;",
+        ]
+        for query in cases:
+            with self.subTest(query=query):
+                self.assertEqual(append_limit(query, "sqlite", 5), "SELECT 1 LIMIT 5")
+
+
+class ParseSelectQueryTest(unittest.TestCase):
+    def test_rejected_queries(self):
+        cases = [
+            ("postgres", "SELECT 1; DROP TABLE users", "Multiple statements"),
+            ("postgres", "SELECT 1; SELECT 2", "Multiple statements"),
+            (
+                "postgres",
+                "WITH d AS (DELETE FROM users RETURNING *) SELECT * FROM d",
+                "Forbidden operation 'DELETE'",
+            ),
+            (
+                "postgres",
+                "WITH u AS (UPDATE users SET a = 1 RETURNING *) SELECT * FROM u",
+                "Forbidden operation 'UPDATE'",
+            ),
+            (
+                "postgres",
+                "WITH i AS (INSERT INTO users (a) VALUES (1) RETURNING *) SELECT * FROM i",
+                "Forbidden operation 'INSERT'",
+            ),
+            (
+                "postgres",
+                "SELECT * INTO new_users FROM users",
+                "Forbidden operation 'INTO'",
+            ),
+            ("mysql", "SELECT * FROM users INTO @v", "Could not parse"),
+            (
+                "postgres",
+                "SELECT * FROM users FOR UPDATE",
+                "Forbidden operation 'LOCK'",
+            ),
+            ("postgres", "SELECT * FROM users FOR SHARE", "Forbidden operation 'LOCK'"),
+            ("mysql", "SELECT * FROM users FOR UPDATE", "Forbidden operation 'LOCK'"),
+            (
+                "mysql",
+                "SELECT * FROM users LOCK IN SHARE MODE",
+                "Forbidden operation 'LOCK'",
+            ),
+            ("sqlite", "DELETE FROM users", "Only SELECT queries are allowed"),
+            ("postgres", "DROP TABLE users", "Only SELECT queries are allowed"),
+            (
+                "mysql",
+                "REPLACE INTO users VALUES (1)",
+                "Only SELECT queries are allowed",
+            ),
+            ("postgres", "", "Only SELECT queries are allowed"),
+            ("sqlite", "SELECT 'abc", "Could not parse"),
+            ("mysql", "SELECT `a", "Could not parse"),
+            ("postgres", "SELECT $$x", "Could not parse"),
+        ]
+        for dialect, query, message in cases:
+            with self.subTest(dialect=dialect, query=query):
+                tree, error = parse_select_query(query, dialect)
+                self.assertIsNone(tree)
+                self.assertIn(message, error)
+
+    def test_allowed_queries(self):
+        cases = [
+            ("sqlite", "SELECT 'delete from users; drop table x' AS note"),
+            ("postgres", "SELECT \"delete\" FROM users WHERE note = ';'"),
+            ("mysql", "SELECT REPLACE(name, 'a', 'b') FROM users"),
+            ("sqlite", "SELECT REPLACE(name, 'a', 'b') FROM users"),
+            ("postgres", "WITH x AS (SELECT 1) SELECT * FROM x"),
+            ("postgres", "SELECT 1 UNION SELECT 2"),
+            ("postgres", "SELECT 1;"),
+        ]
+        for dialect, query in cases:
+            with self.subTest(dialect=dialect, query=query):
+                tree, error = parse_select_query(query, dialect)
+                self.assertIsNone(error)
+                self.assertIsNotNone(tree)
+
+    def test_parse_errors_are_plain_text(self):
+        _, error = parse_select_query("SELECT * FROM t INTO @v", "mysql")
+
+        self.assertIn(
+            "Invalid expression / Unexpected token at line 1, column 20", error
+        )
+        self.assertNotIn("\x1b", error)
+
+
+if __name__ == "__main__":
+    unittest.main()